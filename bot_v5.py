@@ -5,65 +5,131 @@ import time
 import unicodedata
 import asyncio
 import random
-from collections import deque
-from typing import Deque, Dict, Optional, Tuple
+import email.utils
+from functools import lru_cache
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 
 import httpx
+import orjson
+from dotenv import load_dotenv
 from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
+from telegram.request import HTTPXRequest
+
+# =========================
+# Constantes
+# =========================
+load_dotenv()  # lê o .env (se existir) uma única vez, antes de qualquer os.environ
+
+PIKACHU_GIF_URL = "https://media.giphy.com/media/DRfu7BT8ZK1uo/giphy.gif"
+POKEMON_API_URL = "https://api.pokemontcg.io/v2/cards"
+TELEGRAM_BOT_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]  # nunca versionar o token
 
 # =========================
 # Logging
 # =========================
+_nivel_log = logging.getLevelName(os.environ.get("LOG_LEVEL", "INFO").upper())
+if not isinstance(_nivel_log, int):  # nome desconhecido (ex.: "verbose") → INFO
+    _nivel_log = logging.INFO
+# handler no root: logs do python-telegram-bot/httpx saem no mesmo formato que os nossos
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+    level=_nivel_log
 )
 logger = logging.getLogger("pokebot")
 
-# =========================
-# Constantes
-# =========================
-PIKACHU_GIF_URL = "https://media.giphy.com/media/DRfu7BT8ZK1uo/giphy.gif"
-POKEMON_API_URL = "https://api.pokemontcg.io/v2/cards"
-TELEGRAM_BOT_TOKEN = "7572354652:AAEg_EgwLhq55dHNBmiuH4G-iCIxpjb346A"
-
 # =========================
 # Rate Limit por usuário
 # =========================
 MAX_CHAMADAS = 10          # por usuário
 INTERVALO_SEGUNDOS = 60
-historico_por_usuario: Dict[int, Deque[float]] = {}
+# token bucket: user_id -> (tokens disponíveis, instante da última recarga)
+historico_por_usuario: Dict[int, Tuple[float, float]] = {}
+_ultima_limpeza = 0.0
+
+def _limpar_usuarios_ociosos(agora: float) -> None:
+    """Remove usuários parados há muito tempo (balde já estaria cheio de novo)."""
+    limite = INTERVALO_SEGUNDOS * 5
+    ociosos = [uid for uid, (_, ts) in historico_por_usuario.items() if agora - ts > limite]
+    for uid in ociosos:
+        del historico_por_usuario[uid]
 
 def pode_fazer_requisicao(user_id: int) -> bool:
-    agora = time.time()
-    dq = historico_por_usuario.get(user_id)
-    if dq is None:
-        dq = deque()
-        historico_por_usuario[user_id] = dq
-    while dq and (agora - dq[0] > INTERVALO_SEGUNDOS):
-        dq.popleft()
-    if len(dq) < MAX_CHAMADAS:
-        dq.append(agora)
+    global _ultima_limpeza
+    agora = time.monotonic()
+    if agora - _ultima_limpeza > INTERVALO_SEGUNDOS:
+        _ultima_limpeza = agora
+        _limpar_usuarios_ociosos(agora)
+
+    tokens, ultimo = historico_por_usuario.get(user_id, (MAX_CHAMADAS, agora))
+    tokens = min(MAX_CHAMADAS, tokens + (agora - ultimo) * MAX_CHAMADAS / INTERVALO_SEGUNDOS)
+    if tokens >= 1:
+        historico_por_usuario[user_id] = (tokens - 1, agora)
         return True
+    historico_por_usuario[user_id] = (tokens, agora)
     return False
 
 # =========================
-# Cache (simples)
+# Cache (LRU + TTL)
 # =========================
-cache_cartas: Dict[Tuple[str, str, int], Tuple[dict, float]] = {}
+CACHE_TTL_SEGUNDOS = 3600  # validade de cada carta no cache
+MAX_CACHE = 512            # máximo de cartas mantidas (LRU)
+cache_cartas: "OrderedDict[Tuple[str, str, int], Tuple[dict, float]]" = OrderedDict()
 
 def cache_get(chave):
-    """Retorna a carta do cache, ou None se não existir."""
+    """Retorna a carta do cache, ou None se não existir ou estiver expirada."""
     item = cache_cartas.get(chave)
     if not item:
         return None
     carta, ts = item
+    if time.monotonic() - ts > CACHE_TTL_SEGUNDOS:
+        # expiração preguiçosa: só remove quando alguém tenta ler
+        del cache_cartas[chave]
+        return None
+    cache_cartas.move_to_end(chave)
     return carta
 
+def _projetar(d: dict, campos: Tuple[str, ...]) -> dict:
+    return {k: d[k] for k in campos if k in d}
+
+def _project_carta(c: dict) -> dict:
+    """
+    Versão enxuta da carta da API, só com o que enviar_carta/comando_cache usam
+    (descarta legalities, tcgplayer, cardmarket etc., que ocupam a maior parte do dict).
+    """
+    slim = _projetar(c, ("name", "number", "rarity", "types"))
+    if c.get("abilities"):
+        slim["abilities"] = [_projetar(h, ("name", "text")) for h in c["abilities"]]
+    if c.get("attacks"):
+        slim["attacks"] = [_projetar(a, ("name", "cost", "damage", "text")) for a in c["attacks"]]
+    slim["set"] = _projetar(c.get("set") or {}, ("id", "name", "printedTotal"))
+    slim["images"] = _projetar(c.get("images") or {}, ("large", "small"))
+    return slim
+
 def cache_set(chave, carta):
-    """Armazena a carta no cache."""
-    cache_cartas[chave] = (carta, time.time())
+    """
+    Armazena (a projeção enxuta da) carta no cache, descartando as menos usadas se passar
+    de MAX_CACHE. Retorna o dict armazenado.
+    """
+    slim = _project_carta(carta)
+    cache_cartas[chave] = (slim, time.monotonic())
+    cache_cartas.move_to_end(chave)
+    while len(cache_cartas) > MAX_CACHE:
+        cache_cartas.popitem(last=False)
+    return slim
+
+CACHE_SWEEP_SEGUNDOS = 60  # intervalo da varredura de entradas expiradas
+
+async def _cache_sweeper() -> None:
+    """Remove periodicamente as cartas expiradas que nunca mais foram consultadas."""
+    while True:
+        await asyncio.sleep(CACHE_SWEEP_SEGUNDOS)
+        agora = time.monotonic()
+        expiradas = [k for k, (_, ts) in cache_cartas.items() if agora - ts > CACHE_TTL_SEGUNDOS]
+        for k in expiradas:
+            cache_cartas.pop(k, None)
 
 # =========================
 # Deduplicação + limite de concorrência
@@ -71,99 +137,207 @@ def cache_set(chave, carta):
 sem = asyncio.Semaphore(5)  # até 5 chamadas externas simultâneas
 chamadas_em_andamento: Dict[Tuple[str, str, int], asyncio.Future] = {}
 
-async def http_get_dedup(chave: Tuple[str, str, int], params: dict, max_retries: int = 3) -> dict:
+# Cliente HTTP compartilhado (reaproveita conexões keep-alive / HTTP/2)
+CLIENT: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """Retorna o cliente HTTP compartilhado, criando-o na primeira chamada."""
+    global CLIENT
+    if CLIENT is None or CLIENT.is_closed:
+        CLIENT = httpx.AsyncClient(
+            timeout=12,
+            headers={"Accept": "application/json"},
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            http2=True,
+        )
+    return CLIENT
+
+async def fechar_client() -> None:
+    """Fecha o cliente HTTP compartilhado, se existir."""
+    global CLIENT
+    if CLIENT is not None:
+        await CLIENT.aclose()
+        CLIENT = None
+
+BACKOFF_BASE = 1.0  # espera mínima (s) entre tentativas
+BACKOFF_MAX = 30.0  # teto (s) para qualquer espera entre tentativas
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    """Lê o header Retry-After (segundos ou data HTTP). Retorna None se ausente/inválido."""
+    ra = resp.headers.get("Retry-After")
+    if not ra:
+        return None
+    ra = ra.strip()
+    if ra.isascii() and ra.isdigit():
+        # delay-seconds (RFC 9110) é só dígitos: nada de "nan"/"inf", que travariam o sleep
+        espera = float(ra)
+    else:
+        try:
+            espera = email.utils.parsedate_to_datetime(ra).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(espera, 0.0), BACKOFF_MAX)
+
+def _liberar_chave(chave: Tuple[str, str, int], fut: asyncio.Future) -> None:
+    """Remove `fut` do mapa de deduplicação (só se ainda for o registrado para `chave`)."""
+    if chamadas_em_andamento.get(chave) is fut:
+        del chamadas_em_andamento[chave]
+    if not fut.cancelled():
+        fut.exception()  # marca o erro como lido, mesmo sem ninguém aguardando
+
+async def http_get_dedup(
+    chave: Tuple[str, str, int],
+    params: dict,
+    max_retries: int = 3,
+    processar: Optional[Callable[[dict], Any]] = None,
+) -> Any:
+    """
+    GET deduplicado na API. Se `processar` for informado, ele roda UMA vez sobre a resposta
+    (no criador da chamada) e o seu retorno é o que todos os waiters recebem.
+    """
     # Se já existe uma chamada igual em andamento, aguarda o mesmo resultado/erro
     fut = chamadas_em_andamento.get(chave)
     if fut is not None:
-        logger.info(f"🔄 Esperando requisição em andamento para {chave}")
-        return await fut  # pode levantar exceção se o criador set_exception
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("🔄 Esperando requisição em andamento para %s", chave)
+        # shield: se ESTE handler for cancelado, o future compartilhado segue valendo para os demais
+        return await asyncio.shield(fut)  # pode levantar exceção se o criador set_exception
 
     loop = asyncio.get_event_loop()
     fut = loop.create_future()
     chamadas_em_andamento[chave] = fut
+    fut.add_done_callback(lambda f: _liberar_chave(chave, f))
 
     try:
         async with sem:
-            async with httpx.AsyncClient(timeout=12, headers={"Accept": "application/json"}) as client:
-                last_exc = None
-                for attempt in range(max_retries):
-                    try:
-                        resp = await client.get(POKEMON_API_URL, params=params)
-                        if resp.status_code == 429:
-                            espera = (2 ** attempt) + random.uniform(0, 1)
-                            logger.warning(f"429 recebido. Backoff {espera:.2f}s")
-                            await asyncio.sleep(espera)
-                            continue
-                        resp.raise_for_status()
-                        data = resp.json()
+            client = get_client()
+            last_exc = None
+            prev = BACKOFF_BASE  # decorrelated jitter: cada espera deriva da anterior
+            for tentativa in range(max_retries):
+                ultima = tentativa == max_retries - 1
+                try:
+                    resp = await client.get(POKEMON_API_URL, params=params)
+                except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                    # só timeout / falha de conexão são recuperáveis; DecodingError,
+                    # TooManyRedirects etc. não melhoram repetindo e sobem direto
+                    last_exc = e
+                    motivo = f"Erro {e}"
+                    espera = None
+                else:
+                    status = resp.status_code
+                    if resp.is_success:
+                        # orjson (C) decodifica bem mais rápido que resp.json(); os waiters
+                        # só leem o dict, então compartilhar o mesmo objeto é seguro
+                        data = orjson.loads(resp.content)
+                        if processar is not None:
+                            data = processar(data)
                         if not fut.done():
                             fut.set_result(data)
                         return data
-                    except (httpx.TimeoutException, httpx.HTTPStatusError, httpx.RequestError) as e:
-                        last_exc = e
-                        espera = (2 ** attempt) + random.uniform(0, 1)
-                        logger.warning(f"Erro {e}. Retry em {espera:.2f}s")
-                        await asyncio.sleep(espera)
-
-                # Esgotou as tentativas → propaga erro para todo mundo que aguarda
-                if not fut.done():
-                    fut.set_exception(last_exc or RuntimeError("Falha desconhecida"))
-                raise last_exc or RuntimeError("Falha desconhecida")
+
+                    last_exc = httpx.HTTPStatusError(
+                        f"Erro {status} da API", request=resp.request, response=resp
+                    )
+                    if status != 429 and status < 500:
+                        # Demais 4xx (400, 404...) não se resolvem repetindo → falha imediata
+                        break
+                    motivo = f"{status} recebido"
+                    espera = _retry_after(resp) if status == 429 else None
+
+                if ultima:
+                    break  # não adianta esperar se não haverá nova tentativa
+                if espera is None:
+                    prev = espera = min(BACKOFF_MAX, random.uniform(BACKOFF_BASE, prev * 3))
+                logger.warning("%s. Retry em %.2fs", motivo, espera)
+                await asyncio.sleep(espera)
+
+            # Esgotou as tentativas (ou erro não recuperável) → propaga erro para todo mundo que aguarda
+            if not fut.done():
+                fut.set_exception(last_exc or RuntimeError("Falha desconhecida"))
+            raise last_exc or RuntimeError("Falha desconhecida")
+    except asyncio.CancelledError:
+        # Criador cancelado → os waiters recebem um erro comum (não foram eles os cancelados)
+        if not fut.done():
+            fut.set_exception(RuntimeError("Requisição cancelada"))
+        raise
     finally:
-        # Remove do mapa de deduplicação (o future já foi completado com sucesso/erro)
-        chamadas_em_andamento.pop(chave, None)
+        # Qualquer saída sem resultado (ex.: erro inesperado) também libera quem aguarda
+        if not fut.done():
+            fut.set_exception(RuntimeError("Requisição encerrada sem resultado"))
+        _liberar_chave(chave, fut)
 
 # =========================
 # Funções Auxiliares de texto 
 # =========================
+@lru_cache(maxsize=4096)  # nomes de Pokémon se repetem muito entre consultas
 def normalizar_texto(txt: str) -> str:
     return unicodedata.normalize('NFKD', txt).encode('ASCII', 'ignore').decode('utf-8')
 
+_MARKDOWN_ESCAPES = str.maketrans({'*': '\\*', '_': '\\_', '[': '\\[', ']': '\\]'})
+
 def escape_markdown(text: str) -> str:
-    return text.replace('*', '\\*').replace('_', '\\_').replace('[', '\\[').replace(']', '\\]')
+    return text.translate(_MARKDOWN_ESCAPES)
 
 # =========================
 # Seleção da carta (extraída)
 # =========================
 def selecionar_carta(cartas_encontradas: list[dict], total_usuario: int) -> Optional[dict]:
-    def sid(c):
-        s = c.get('set') or {}
-        return s.get('id')
+    if len(cartas_encontradas) == 1:
+        logger.info("🎯 Resultado único")
+        return cartas_encontradas[0]
 
-    def pt(c):
+    # Uma única passada materializa (set.id, printedTotal, carta)
+    meta = []
+    for c in cartas_encontradas:
         s = c.get('set') or {}
-        return s.get('printedTotal')
+        meta.append((s.get('id'), s.get('printedTotal'), c))
 
     # 1) Se todos os resultados têm o MESMO set.id, é decisivo
-    set_ids = {x for x in (sid(c) for c in cartas_encontradas) if x}
+    set_ids = {sid for sid, _, _ in meta if sid}
     if len(set_ids) == 1:
         logger.info("🎯 Seleção por set.id único")
         return cartas_encontradas[0]
 
     # 2) Tente correspondência EXATA de printedTotal
-    exatos = [c for c in cartas_encontradas if pt(c) == total_usuario]
+    exatos = [(sid, c) for sid, pt, c in meta if pt == total_usuario]
     if len(exatos) == 1:
         logger.info("🎯 Seleção por printedTotal EXATO")
-        return exatos[0]
+        return exatos[0][1]
     if len(exatos) > 1:
-        ex_ids = {x for x in (sid(c) for c in exatos) if x}
+        ex_ids = {sid for sid, _ in exatos if sid}
         if len(ex_ids) == 1:
             logger.info("🎯 EXATO + set.id único")
-            return exatos[0]
+            return exatos[0][1]
 
     # 3) Tolerância ±1 no printedTotal
-    tol = [c for c in cartas_encontradas if isinstance(pt(c), int) and abs(pt(c) - total_usuario) <= 1]
+    tol = [(sid, c) for sid, pt, c in meta if isinstance(pt, int) and abs(pt - total_usuario) <= 1]
     if len(tol) == 1:
         logger.info("🎯 Tolerância (±1)")
-        return tol[0]
+        return tol[0][1]
     if len(tol) > 1:
-        tol_ids = {x for x in (sid(c) for c in tol) if x}
+        tol_ids = {sid for sid, _ in tol if sid}
         if len(tol_ids) == 1:
             logger.info("🎯 Tolerância (±1) + set.id único")
-            return tol[0]
+            return tol[0][1]
 
     return None
 
+def resolver_carta(
+    chave: Tuple[str, str, int], total_usuario: int, dados: dict
+) -> Tuple[list[dict], Optional[dict]]:
+    """
+    Seleciona a carta da resposta da API e já a salva no cache.
+    Roda dentro de http_get_dedup, então consultas simultâneas iguais fazem isso uma vez só.
+    Retorna a tupla (cartas_encontradas, carta), que é o que http_get_dedup devolve a todos
+    os waiters; `carta` é None se nenhuma corresponder à coleção do usuário.
+    """
+    cartas_encontradas = dados.get('data', []) or []
+    carta = selecionar_carta(cartas_encontradas, total_usuario) if cartas_encontradas else None
+    if carta:
+        # devolve o dict do cache: é nele que enviar_carta guarda o file_id da foto
+        carta = cache_set(chave, carta)
+    return cartas_encontradas, carta
+
 # =========================
 # Comandos do Bot
 # =========================
@@ -184,17 +358,35 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         parse_mode='Markdown'
     )
 
+_RE_NUM = re.compile(r"(\(?\s*(\d+)\s*/\s*(\d+)\s*\)?)")
+_RE_WS = re.compile(r"\s+")
+
 def extrair_nome_e_numeracao(args: list[str]) -> Tuple[Optional[str], Optional[str], Optional[int]]:
     if not args:
         return None, None, None
+
+    # Caminho rápido (caso comum): último token é "(N/T)" ou "N/T" → dispensa regex.
+    # Só vale se o nome antes dele não tiver "/" (a regex pegaria a 1ª numeração, não a
+    # última) nem terminar em "(" (a regex incluiria o parêntese no match, fora do nome).
+    nome = " ".join(args[:-1])
+    if "/" not in nome and not nome.endswith("("):
+        ultimo = args[-1]
+        if ultimo.startswith("("):
+            ultimo = ultimo[1:]
+        if ultimo.endswith(")"):
+            ultimo = ultimo[:-1]
+        num, barra, tot = ultimo.partition("/")
+        if barra and num.isdecimal() and tot.isdecimal():
+            return nome, str(int(num)), int(tot)
+
     joined = " ".join(args)
-    m = re.search(r"(\(?\s*(\d+)\s*/\s*(\d+)\s*\)?)", joined)
+    m = _RE_NUM.search(joined)
     if not m:
         return None, None, None
     numero = str(int(m.group(2)))
     total = int(m.group(3))
     nome = joined[:m.start()].strip()
-    nome = re.sub(r"\s+", " ", nome)
+    nome = _RE_WS.sub(" ", nome)
     return nome, numero, total
 
 async def procurar_carta_especifica(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -205,6 +397,14 @@ async def procurar_carta_especifica(update: Update, context: ContextTypes.DEFAUL
         return
 
     loading_msg = await context.bot.send_animation(chat_id=chat_id, animation=PIKACHU_GIF_URL)
+    delete_task: Optional[asyncio.Task] = None
+
+    def apagar_em_paralelo() -> None:
+        # tira o GIF do caminho crítico: apaga enquanto a carta é enviada
+        nonlocal delete_task
+        if delete_task is None:
+            delete_task = asyncio.create_task(apagar_loading(context, chat_id, loading_msg.message_id))
+
     try:
         nome_carta, numero_carta, total_colecao_usuario = extrair_nome_e_numeracao(context.args)
         if not (nome_carta and numero_carta and total_colecao_usuario is not None):
@@ -217,37 +417,43 @@ async def procurar_carta_especifica(update: Update, context: ContextTypes.DEFAUL
         # 1) Tenta pegar do cache
         carta = cache_get(chave_cache)
         if carta:
-            logger.info(f"✅ Cache hit para {chave_cache}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ Cache hit para %s", chave_cache)
+            apagar_em_paralelo()
             await enviar_carta(update, context, carta)
             return
 
-        # 2) Busca na API
+        # 2) Busca na API + 3) seleciona/cacheia a carta (uma vez só, mesmo com waiters)
         try:
-            dados = await http_get_dedup(chave_cache, {"q": f'name:"{nome_normalizado}" number:"{numero_carta}"'})
+            cartas_encontradas, carta_correta = await http_get_dedup(
+                chave_cache,
+                {"q": f'name:"{nome_normalizado}" number:"{numero_carta}"'},
+                processar=lambda dados: resolver_carta(chave_cache, total_colecao_usuario, dados),
+            )
         except Exception:
             await update.message.reply_text("Erro de conexão com a API Pokémon TCG.")
             return
 
-        cartas_encontradas = dados.get('data', []) or []
         if not cartas_encontradas:
             await update.message.reply_text(f"Não encontrei '{nome_carta}' nº {numero_carta}.")
             return
 
-        # 3) Seleciona a carta correta (função extraída)
-        carta_correta = selecionar_carta(cartas_encontradas, total_colecao_usuario)
         if not carta_correta:
             await update.message.reply_text(
                 f"Encontrei '{nome_carta}' nº {numero_carta}, mas não na coleção com {total_colecao_usuario} cartas."
             )
             return
 
-        # 4) Salva no cache e envia
-        cache_set(chave_cache, carta_correta)
+        # 4) Envia (a carta já foi salva no cache por resolver_carta)
+        apagar_em_paralelo()
         await enviar_carta(update, context, carta_correta)
 
     finally:
-        # garante que o GIF sai em qualquer caminho
-        await apagar_loading(context, chat_id, loading_msg.message_id)
+        # garante que o GIF sai em qualquer caminho (e que a task não fica órfã)
+        if delete_task is None:
+            await apagar_loading(context, chat_id, loading_msg.message_id)
+        else:
+            await asyncio.shield(delete_task)
 
 CAPTION_LIMIT = 1024
 
@@ -257,13 +463,15 @@ def _truncate(text: str, limit: int = CAPTION_LIMIT - 50) -> str:
     return text[: max(0, limit - 3)] + "..."
 
 async def enviar_carta(update: Update, context: ContextTypes.DEFAULT_TYPE, carta: dict) -> None:
-    printed_total = (carta.get('set') or {}).get('printedTotal', '?')
+    s = carta.get('set') or {}
+    img = carta.get('images') or {}
+    printed_total = s.get('printedTotal', '?')
     nome_formatado = f"{carta.get('name','')} ({carta.get('number','')}/{printed_total})"
-    colecao = (carta.get('set') or {}).get('name', 'Desconhecida')
+    colecao = s.get('name', 'Desconhecida')
     raridade = carta.get('rarity', 'Não informada')
     tipo = ", ".join(carta.get('types', ['N/A']))
     preco = "$2.73 (via TCGplayer)"  # TODO: puxar preço real da API se quiser
-    url_imagem = ((carta.get('images') or {}).get('large')) or ((carta.get('images') or {}).get('small'))
+    url_imagem = img.get('large') or img.get('small')
 
     # -------------------
     # Balão 1: informações gerais
@@ -277,18 +485,38 @@ async def enviar_carta(update: Update, context: ContextTypes.DEFAULT_TYPE, carta
     )
     caption = _truncate(caption, CAPTION_LIMIT - 20)
 
-    try:
-        if url_imagem:
-            await context.bot.send_photo(
-                chat_id=update.effective_chat.id,
-                photo=url_imagem,
-                caption=caption  # sem parse_mode para não interferir na diagramação
-            )
-        else:
+    async def enviar_foto(photo: str) -> None:
+        msg_foto = await context.bot.send_photo(
+            chat_id=update.effective_chat.id,
+            photo=photo,
+            caption=caption  # sem parse_mode para não interferir na diagramação
+        )
+        if msg_foto.photo:
+            # file_id permite reenviar direto do storage do Telegram, sem baixar a URL de novo
+            carta['_tg_file_id'] = msg_foto.photo[-1].file_id
+
+    async def enviar_balao_1() -> None:
+        try:
+            file_id = carta.get('_tg_file_id')
+            if file_id:
+                try:
+                    await enviar_foto(file_id)
+                    return
+                except BadRequest as e:
+                    # file_id inválido → descarta e usa a URL; erros de rede vão para o fallback
+                    # de baixo (a foto pode já ter sido entregue, não reenviamos)
+                    logger.warning(f"file_id rejeitado, usando URL: {e}")
+                    carta.pop('_tg_file_id', None)
+            if url_imagem:
+                await enviar_foto(url_imagem)
+            else:
+                await update.message.reply_text(caption)
+        except Exception as e:
+            logger.warning(f"Falha em send_photo, fallback: {e}")
             await update.message.reply_text(caption)
-    except Exception as e:
-        logger.warning(f"Falha em send_photo, fallback: {e}")
-        await update.message.reply_text(caption)
+
+    # o 2º balão só sai depois da foto, para manter a ordem no chat
+    await enviar_balao_1()
 
     # -------------------
     # Balão 2: habilidades (se tiver) + ataques
@@ -331,7 +559,6 @@ async def enviar_carta(update: Update, context: ContextTypes.DEFAULT_TYPE, carta
         await context.bot.send_message(chat_id=update.effective_chat.id, text=msg)
 
 
-
 async def apagar_loading(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int) -> None:
     try:
         await context.bot.delete_message(chat_id=chat_id, message_id=message_id)
@@ -346,9 +573,13 @@ async def on_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
 
 def listar_cache() -> list[dict]:
     """
-    Retorna todas as cartas atualmente no cache (apenas os dados da carta).
+    Retorna as cartas válidas (não expiradas) no cache, da mais recente para a mais antiga.
     """
-    return [carta for (carta, ts) in cache_cartas.values()]
+    agora = time.monotonic()
+    return [
+        carta for (carta, ts) in reversed(cache_cartas.values())
+        if agora - ts <= CACHE_TTL_SEGUNDOS
+    ]
 
 # Comando para inspecionar cache (apenas para debug)
 async def comando_cache(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -357,17 +588,48 @@ async def comando_cache(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         await update.message.reply_text("🗑️ Cache vazio.")
         return
 
-    resposta = "\n".join(
-        f"- {c.get('name','?')} ({c.get('number','?')}/{(c.get('set') or {}).get('printedTotal','?')})"
-        for c in cartas[:20]  # mostra no máximo 20 pra não lotar o chat
-    )
+    linhas = []
+    for c in cartas[:20]:  # mostra no máximo 20 pra não lotar o chat
+        s = c.get('set') or {}
+        linhas.append(f"- {c.get('name','?')} ({c.get('number','?')}/{s.get('printedTotal','?')})")
+    resposta = "\n".join(linhas)
     await update.message.reply_text(f"Cartas no cache:\n{resposta}")
 
 # =========================
 # Inicialização do Bot
 # =========================
+async def post_init(application: Application) -> None:
+    get_client()
+    # uma única task de varredura (em vez de um timer por entrada)
+    application.bot_data["cache_sweeper"] = asyncio.create_task(_cache_sweeper())
+
+async def post_shutdown(application: Application) -> None:
+    sweeper = application.bot_data.pop("cache_sweeper", None)
+    if sweeper is not None:
+        sweeper.cancel()
+    await fechar_client()
+
 def main():
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    try:
+        import uvloop  # loop baseado em libuv, mais rápido que o padrão (indisponível no Windows)
+        uvloop.install()
+    except ImportError:
+        pass
+
+    # Pool maior para os handlers concorrentes não fazerem fila nas chamadas ao Telegram.
+    # O getUpdates (long polling) usa uma instância própria para não ocupar esse pool.
+    req = HTTPXRequest(connection_pool_size=32, connect_timeout=10, read_timeout=30, pool_timeout=5)
+    req_updates = HTTPXRequest(connect_timeout=10, read_timeout=30, pool_timeout=5)
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .request(req)
+        .get_updates_request(req_updates)
+        .concurrent_updates(True)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
     application.add_handler(CommandHandler("cache", comando_cache))
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))